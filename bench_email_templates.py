@@ -0,0 +1,122 @@
+# bench_email_templates.py
+# Micro-benchmark: render N notifications per event with the cached Jinja
+# templates (notification_templates) vs. the old per-call f-string helpers,
+# e.g. to size a mass re-send after an SMTP outage. Nothing is sent.
+#
+#   python bench_email_templates.py --count 5000
+import argparse
+import os
+import time
+from datetime import date, datetime, timedelta
+
+parser = argparse.ArgumentParser(description='Email template render benchmark')
+parser.add_argument('--count', type=int, default=5000, help='notifications per event')
+args = parser.parse_args()
+
+os.environ['DATABASE_URL'] = 'sqlite://'
+os.environ.setdefault('PUBLIC_BASE_URL', 'https://hotel.example.com')
+from flask import url_for  # noqa: E402
+from app import (  # noqa: E402
+    app, Booking, RoomType, NOTIFICATION_SUBJECTS, init_db, notification_templates, room_catalog, seed_db,
+)
+
+
+def _admin_link(booking):
+    # what every old staff helper did per email
+    try:
+        return url_for('admin_booking_detail', booking_id=booking.id, _external=True)
+    except Exception:
+        return f"/admin/booking/{booking.id}"
+
+
+def legacy_render(event, booking):
+    """The subject/body construction the helpers in app.py used before the template layer."""
+    suite_name = getattr(getattr(booking, 'room_type', None), 'name', 'N/A')
+    html = None
+    if event == 'booking_received':
+        subject = f'Habeeb Empyrean — Booking Received (Ref #{booking.id})'
+        body = (f"Dear {booking.full_name},\n\nThank you for booking at Habeeb Empyrean Hotel & Resort. Your booking "
+                f"request has been received and is awaiting hotel confirmation.\n\nBooking reference: {booking.id}\n"
+                f"Suite: {booking.room_type.name}\nCheck-in: {booking.checkin}\nCheck-out: {booking.checkout}\n"
+                f"Guests: {booking.guests}\n\nWe will notify you once the hotel confirms your booking.\n\n"
+                "Warm regards,\nHabeeb Empyrean Hotel & Resort Concierge\n")
+    elif event == 'booking_confirmed':
+        subject = f'Habeeb Empyrean — Booking Confirmed (Ref #{booking.id})'
+        body = (f"Dear {booking.full_name},\n\nThank you for booking at Habeeb Empyrean Hotel and Resort — your booking "
+                f"has been confirmed.\n\nBooking reference: {booking.id}\nSuite: {suite_name}\n"
+                f"Check-in: {booking.checkin}\nCheck-out: {booking.checkout}\n\nWe look forward to hosting you.\n\n"
+                "Warm regards,\nHabeeb Empyrean Hotel & Resort Concierge\n")
+        html = f"""
+        <p>Dear {booking.full_name},</p>
+        <p>Thank you for booking at <strong>Habeeb Empyrean Hotel and Resort</strong> — your booking has been <strong>confirmed</strong>.</p>
+        <ul>
+          <li><strong>Booking reference:</strong> {booking.id}</li>
+          <li><strong>Suite:</strong> {suite_name}</li>
+          <li><strong>Check-in:</strong> {booking.checkin}</li>
+          <li><strong>Check-out:</strong> {booking.checkout}</li>
+        </ul>
+        <p>Warm regards,<br>Habeeb Empyrean Hotel &amp; Resort Concierge</p>
+        """
+    elif event == 'booking_cancelled':
+        subject = f'Habeeb Empyrean — Booking Cancelled (Ref #{booking.id})'
+        lines = [f"Dear {booking.full_name},", "", "We regret to inform you that your booking has been cancelled", "",
+                 f"Booking reference: {booking.id}", f"Suite: {suite_name}",
+                 f"Check-in: {booking.checkin}", f"Check-out: {booking.checkout}"]
+        if booking.cancelled_at:
+            lines.append(f"Cancelled at: {booking.cancelled_at}")
+        if booking.cancellation_reason:
+            lines.extend(["", "Reason for cancellation:", booking.cancellation_reason])
+        lines.extend(["", "Warm regards,", "Habeeb Empyrean Hotel & Resort Concierge"])
+        body = "\n".join(lines)
+    else:
+        admin_link = _admin_link(booking)
+        subject = {
+            'hotel_new_booking': f'New Booking Request — Ref #{booking.id}',
+            'staff_confirmed': f'Booking Confirmed — Ref #{booking.id}',
+            'hotel_cancelled': f'Booking Cancelled — Ref #{booking.id}',
+        }[event]
+        lines = ["A booking changed at Habeeb Empyrean Hotel & Resort.", "",
+                 f"Reference: {booking.id}", f"Name: {booking.full_name}", f"Email: {booking.email}",
+                 f"Phone: {booking.phone or 'N/A'}", f"Suite: {suite_name}",
+                 f"Check-in: {booking.checkin}", f"Check-out: {booking.checkout}",
+                 f"Status: {booking.status}", f"Created at: {booking.created_at}"]
+        if booking.cancellation_reason:
+            lines.extend(["", "Cancellation reason:", booking.cancellation_reason])
+        lines.extend(["", f"Admin page: {admin_link}"])
+        body = "\n".join(lines)
+    return subject, body, html
+
+
+def run(label, render, bookings):
+    started = time.perf_counter()
+    rendered = 0
+    for event in NOTIFICATION_SUBJECTS:
+        for booking in bookings:
+            render(event, booking)
+            rendered += 1
+    elapsed = time.perf_counter() - started
+    print(f"{label:<18} {rendered:>8} emails in {elapsed:7.3f}s  -> {rendered / elapsed:10.0f} emails/s")
+    return elapsed
+
+
+with app.app_context():
+    init_db()
+    seed_db()
+    room_types = RoomType.query.all()
+    room_catalog.all()  # warm the catalog before transient bookings join the session
+    today = date.today()
+    bookings = []
+    for i in range(args.count):
+        room_type = room_types[i % len(room_types)]
+        bookings.append(Booking(
+            id=i + 1, full_name=f'Guest {i}', email=f'guest{i}@example.com', phone='+234 800 000 0000',
+            checkin=today + timedelta(days=i % 90), checkout=today + timedelta(days=i % 90 + 2),
+            room_type=room_type, room_type_id=room_type.id, guests=2, status='confirmed',
+            created_at=datetime.utcnow(), cancellation_reason='Guest request' if i % 3 == 0 else None,
+        ))
+    print(f"Rendering {args.count} bookings x {len(NOTIFICATION_SUBJECTS)} events (subject + plain + html)")
+    notification_templates.render('booking_received', bookings[0])  # templates compile on first use
+    legacy = run('legacy f-strings', legacy_render, bookings)
+    cached = run('cached templates', notification_templates.render, bookings)
+    print(f"cached templates take {cached / legacy:.2f}x the legacy time "
+          "(and now also produce an HTML part for every event)")
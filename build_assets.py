@@ -0,0 +1,111 @@
+# build_assets.py
+# Fingerprints every file under static/ for the app's static view: writes
+# static/dist/manifest.json (source path -> content-hashed URL) plus gzip and
+# brotli copies of the compressible ones. url_for('static', ...) then emits the
+# hashed URL, served with a one-year immutable Cache-Control. Run it on deploy,
+# after build_images.py (the image variants get fingerprinted too).
+#
+#   python build_assets.py            # brotli copies need: pip install brotli
+#   python build_assets.py --clean    # also drop compressed files no longer referenced
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import re
+import time
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+STATIC = os.path.join(HERE, 'static')
+DIST = os.path.join(STATIC, 'dist')
+MANIFEST = os.path.join(DIST, 'manifest.json')
+COMPRESSIBLE = ('.css', '.js', '.svg', '.json', '.txt', '.html', '.xml', '.map')
+# build_images.py output is already named by content hash
+ALREADY_HASHED = re.compile(r'\.[0-9a-f]{10}\.[a-z0-9]+$')
+
+parser = argparse.ArgumentParser(description='Fingerprint and precompress static assets')
+parser.add_argument('--clean', action='store_true', help='delete compressed files the manifest no longer uses')
+args = parser.parse_args()
+
+
+def file_hash(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def write_if_smaller(path, data, original_size):
+    # not worth a variant (or the Vary header) if it barely saves anything
+    if len(data) > original_size * 0.95:
+        return False
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if not os.path.exists(path):
+        with open(path, 'wb') as fh:
+            fh.write(data)
+    return True
+
+
+def main():
+    if brotli is None:
+        print("brotli not installed; writing gzip copies only")
+    started = time.perf_counter()
+    manifest, written = {}, set()
+    raw_bytes = compressed_bytes = 0
+    for root, dirs, files in os.walk(STATIC):
+        if os.path.abspath(root) == DIST:
+            dirs[:] = []
+            continue
+        dirs.sort()
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            rel = os.path.relpath(path, STATIC).replace(os.sep, '/')
+            if ALREADY_HASHED.search(name):
+                url = rel
+            else:
+                stem, ext = os.path.splitext(rel)
+                url = f"{stem}.{file_hash(path)[:10]}{ext}"
+            entry = {'url': url, 'encodings': []}
+            if name.lower().endswith(COMPRESSIBLE):
+                with open(path, 'rb') as fh:
+                    data = fh.read()
+                target = os.path.join(DIST, *url.split('/'))
+                variants = [('gzip', '.gz', lambda d: gzip.compress(d, compresslevel=9, mtime=0))]
+                if brotli is not None:
+                    variants.insert(0, ('br', '.br', lambda d: brotli.compress(d, quality=11)))
+                for encoding, suffix, compress in variants:
+                    packed = compress(data)
+                    if write_if_smaller(target + suffix, packed, len(data)):
+                        entry['encodings'].append(encoding)
+                        written.add(os.path.abspath(target + suffix))
+                        if encoding == 'gzip':
+                            raw_bytes += len(data)
+                            compressed_bytes += len(packed)
+            manifest[rel] = entry
+
+    os.makedirs(DIST, exist_ok=True)
+    tmp = MANIFEST + '.tmp'
+    with open(tmp, 'w') as fh:
+        json.dump(manifest, fh, indent=1, sort_keys=True)
+    os.replace(tmp, MANIFEST)
+
+    if args.clean:
+        for root, _, files in os.walk(DIST):
+            for name in files:
+                path = os.path.abspath(os.path.join(root, name))
+                if path != os.path.abspath(MANIFEST) and path not in written:
+                    os.remove(path)
+
+    print(f"{len(manifest)} assets fingerprinted, {len(written)} precompressed copies "
+          f"in {time.perf_counter() - started:.1f}s (text assets {raw_bytes / 1024:.0f} KB -> "
+          f"{compressed_bytes / 1024:.0f} KB gzip)")
+
+
+if __name__ == '__main__':
+    main()
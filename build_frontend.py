@@ -0,0 +1,281 @@
+# build_frontend.py
+# Builds the landing page's stylesheet from the vendored front-end libraries:
+#   static/build/site.css      Bootstrap + the Bootstrap Icons glyphs we use + main.css,
+#                              with every rule no template or script can match removed
+#   static/build/frontend.json {"stylesheet": ..., "critical_css": ...}; the critical
+#                              CSS (rules matching the navbar/hero) is inlined by
+#                              index.html, which then loads site.css without blocking
+# Without a build the templates link the vendored files directly.
+# Run on deploy after build_images.py and before build_assets.py.
+#
+#   python build_frontend.py
+#   python build_frontend.py --fetch     # refresh static/vendor/ from jsDelivr first
+import argparse
+import json
+import os
+import re
+import sys
+import time
+import urllib.request
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+STATIC = os.path.join(HERE, 'static')
+BUILD = os.path.join(STATIC, 'build')
+TEMPLATES = os.path.join(HERE, 'templates')
+
+# static path -> upstream URL (MIT licensed; keep the banners)
+VENDOR = {
+    'vendor/bootstrap-5.3.8/bootstrap.min.css':
+        'https://cdn.jsdelivr.net/npm/bootstrap@5.3.8/dist/css/bootstrap.min.css',
+    'vendor/bootstrap-5.3.8/bootstrap.min.js':
+        'https://cdn.jsdelivr.net/npm/bootstrap@5.3.8/dist/js/bootstrap.min.js',
+    'vendor/bootstrap-icons-1.13.1/bootstrap-icons.min.css':
+        'https://cdn.jsdelivr.net/npm/bootstrap-icons@1.13.1/font/bootstrap-icons.min.css',
+    'vendor/bootstrap-icons-1.13.1/fonts/bootstrap-icons.woff2':
+        'https://cdn.jsdelivr.net/npm/bootstrap-icons@1.13.1/font/fonts/bootstrap-icons.woff2',
+    'vendor/bootstrap-icons-1.13.1/fonts/bootstrap-icons.woff':
+        'https://cdn.jsdelivr.net/npm/bootstrap-icons@1.13.1/font/fonts/bootstrap-icons.woff',
+}
+# concatenated in this order
+STYLESHEETS = [
+    'vendor/bootstrap-5.3.8/bootstrap.min.css',
+    'vendor/bootstrap-icons-1.13.1/bootstrap-icons.min.css',
+    'css/main.css',
+]
+# where class names can come from: markup, plus scripts that toggle classes at runtime
+CONTENT = ['templates', 'static/js/main.js', 'static/vendor/bootstrap-5.3.8/bootstrap.min.js']
+# everything above this marker in the rendered landing page is "above the fold"
+FOLD_MARKER = '<section id="rooms"'
+
+parser = argparse.ArgumentParser(description='Build the purged + critical CSS bundle')
+parser.add_argument('--fetch', action='store_true', help='download the pinned vendor files first')
+args = parser.parse_args()
+
+
+# --- a small CSS parser: enough for minified Bootstrap and hand-written main.css ---
+
+def parse_css(css):
+    """-> list of (prelude, body); body is a nested list for grouping at-rules, else a string."""
+    rules, i, n = [], 0, len(css)
+    while i < n:
+        start = i
+        depth = 0
+        while i < n:
+            ch = css[i]
+            if css.startswith('/*', i):
+                end = css.find('*/', i + 2)
+                i = n if end < 0 else end + 2
+                continue
+            if ch in '"\'':
+                end = i + 1
+                while end < n and css[end] != ch:
+                    end += 2 if css[end] == '\\' else 1
+                i = end + 1
+                continue
+            if ch == ';' and depth == 0:
+                # @charset / @import
+                rules.append((css[start:i].strip(), None))
+                i += 1
+                break
+            if ch == '{':
+                prelude = css[start:i].strip()
+                body_start = i + 1
+                depth = 1
+                i += 1
+                while i < n and depth:
+                    if css[i] in '"\'':
+                        quote = css[i]
+                        i += 1
+                        while i < n and css[i] != quote:
+                            i += 2 if css[i] == '\\' else 1
+                    elif css[i] == '{':
+                        depth += 1
+                    elif css[i] == '}':
+                        depth -= 1
+                    i += 1
+                body = css[body_start:i - 1]
+                if re.match(r'@(media|supports|layer|container)\b', prelude):
+                    body = parse_css(body)
+                rules.append((re.sub(r'/\*.*?\*/', '', prelude, flags=re.S).strip(), body))
+                break
+            i += 1
+        else:
+            break
+    return rules
+
+
+def serialize(rules):
+    out = []
+    for prelude, body in rules:
+        if body is None:
+            out.append(prelude + ';')
+        elif isinstance(body, list):
+            out.append(prelude + '{' + serialize(body) + '}')
+        else:
+            out.append(prelude + '{' + body.strip() + '}')
+    return ''.join(out)
+
+
+def split_selectors(prelude):
+    parts, depth, current = [], 0, ''
+    for ch in prelude:
+        if ch in '([':
+            depth += 1
+        elif ch in ')]':
+            depth -= 1
+        if ch == ',' and depth == 0:
+            parts.append(current)
+            current = ''
+        else:
+            current += ch
+    parts.append(current)
+    return [p.strip() for p in parts if p.strip()]
+
+
+def selector_tokens(selector):
+    """Class names, ids and element names a selector needs to be present."""
+    # :not(.x), :is(...), attribute values etc. never make a selector unmatchable;
+    # attribute names do ([data-bs-theme=dark] needs a data-bs-theme somewhere)
+    attributes = re.findall(r'\[\s*([\w-]+)', selector)
+    simplified = re.sub(r'\[[^\]]*\]', '', selector)
+    simplified = re.sub(r'::?[a-zA-Z-]+(\([^)]*\))?', '', simplified)
+    tokens = re.findall(r'[.#]((?:\\.|[\w-])+)', simplified)
+    tags = re.findall(r'(?:^|[\s>+~])([a-zA-Z][\w-]*)', simplified)
+    return [t.replace('\\', '') for t in tokens] + [t.lower() for t in tags] + [a.lower() for a in attributes]
+
+
+def purge(rules, words):
+    kept = []
+    for prelude, body in rules:
+        if body is None or prelude.startswith(('@font-face', '@keyframes', '@-webkit-keyframes', '@page')):
+            kept.append((prelude, body))
+        elif isinstance(body, list):
+            inner = purge(body, words)
+            if inner:
+                kept.append((prelude, inner))
+        else:
+            selectors = [s for s in split_selectors(prelude) if all(t in words for t in selector_tokens(s))]
+            if selectors:
+                kept.append((','.join(selectors), body))
+    return kept
+
+
+def drop_unused_at_rules(rules, css_text):
+    """Keyframes nobody animates to, icon @font-face with no glyph rules left."""
+    kept = []
+    for prelude, body in rules:
+        m = re.match(r'@(?:-webkit-)?keyframes\s+([\w-]+)', prelude)
+        if m and not re.search(r'animation[^;{}]*\b' + re.escape(m.group(1)) + r'\b', css_text):
+            continue
+        if prelude.startswith('@font-face') and 'bootstrap-icons' in body and '.bi-' not in css_text:
+            continue
+        kept.append((prelude, body))
+    return kept
+
+
+def words_in(text):
+    # like PurgeCSS's default extractor: any word might be a class name
+    return set(re.findall(r'[A-Za-z0-9_-]+', text))
+
+
+def markup_words(html):
+    """Only what the markup actually uses: tag names, attribute names, classes and ids."""
+    words = set()
+    for tag, attrs in re.findall(r'<([a-zA-Z][\w-]*)([^>]*)>', html):
+        words.add(tag.lower())
+        for name, value in re.findall(r'([\w-]+)\s*=\s*"([^"]*)"', attrs):
+            words.add(name.lower())
+            if name in ('class', 'id'):
+                words.update(value.split())
+    return words
+
+
+def rewrite_urls(css, source_rel):
+    """Relative url()s resolve against the source file; rebase them onto build/."""
+    source_dir = os.path.dirname(source_rel)
+
+    def fix(m):
+        url = m.group(2)
+        if re.match(r'(data:|https?:|/|#)', url):
+            return m.group(0)
+        target = os.path.normpath(os.path.join(source_dir, url.split('?')[0]))
+        rebased = os.path.relpath(target, 'build').replace(os.sep, '/')
+        return f'url({m.group(1)}{rebased}{m.group(1)})'
+
+    return re.sub(r'url\((["\']?)([^"\')]+)\1\)', fix, css)
+
+
+def fetch_vendor():
+    for rel, url in VENDOR.items():
+        path = os.path.join(STATIC, *rel.split('/'))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        print(f"  {url}")
+        with urllib.request.urlopen(url, timeout=30) as resp:
+            data = resp.read()
+        with open(path, 'wb') as fh:
+            fh.write(data)
+
+
+def render_landing_page():
+    # render through the app so responsive_img() etc. produce their real markup
+    os.environ['DATABASE_URL'] = 'sqlite://'
+    os.environ.setdefault('MAIL_USERNAME', '')
+    sys.path.insert(0, HERE)
+    from app import app, init_db, render_index, seed_db
+    with app.test_request_context('/'):
+        init_db()
+        seed_db()
+        page = render_index()
+    # an earlier build's inlined critical CSS must not vouch for itself
+    return re.sub(r'<style\b.*?</style>', '', page, flags=re.S)
+
+
+def main():
+    if args.fetch:
+        fetch_vendor()
+    started = time.perf_counter()
+
+    content = ''
+    for rel in CONTENT:
+        path = os.path.join(HERE, rel)
+        files = [os.path.join(root, f) for root, _, names in os.walk(path) for f in names] if os.path.isdir(path) else [path]
+        for f in files:
+            with open(f, encoding='utf-8', errors='replace') as fh:
+                content += fh.read() + '\n'
+    page = render_landing_page()
+    all_words = words_in(content) | words_in(page) | {'html', 'body'}
+    fold = page.find(FOLD_MARKER)
+    fold_words = markup_words(page[:fold if fold > 0 else len(page)]) | {'html', 'body'}
+
+    source_css, banners = '', []
+    for rel in STYLESHEETS:
+        with open(os.path.join(STATIC, *rel.split('/')), encoding='utf-8') as fh:
+            css = fh.read()
+        banners += re.findall(r'/\*!.*?\*/', css, re.S)
+        source_css += rewrite_urls(re.sub(r'@charset[^;]*;', '', css), rel) + '\n'
+    rules = parse_css(source_css)
+
+    site = purge(rules, all_words)
+    site = drop_unused_at_rules(site, serialize(site))
+    critical = purge(rules, fold_words)
+    critical = [(p, b) for p, b in critical if not p.startswith(('@font-face', '@keyframes', '@-webkit-keyframes'))]
+
+    os.makedirs(BUILD, exist_ok=True)
+    site_css = '@charset "UTF-8";' + ''.join(banners) + serialize(site)
+    with open(os.path.join(BUILD, 'site.css'), 'w', encoding='utf-8') as fh:
+        fh.write(site_css)
+    critical_css = serialize(critical)
+    with open(os.path.join(BUILD, 'frontend.json'), 'w', encoding='utf-8') as fh:
+        json.dump({
+            'stylesheet': 'build/site.css',
+            'script': 'vendor/bootstrap-5.3.8/bootstrap.min.js',
+            # served inline, so point relative urls back at /static/build/
+            'critical_css': re.sub(r'url\((["\']?)\.\./', r'url(\1/static/', critical_css),
+        }, fh)
+
+    print(f"source CSS {len(source_css) / 1024:.0f} KB -> site.css {len(site_css) / 1024:.0f} KB, "
+          f"critical {len(critical_css) / 1024:.1f} KB inline ({time.perf_counter() - started:.1f}s)")
+
+
+if __name__ == '__main__':
+    main()
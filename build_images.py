@@ -0,0 +1,145 @@
+# build_images.py
+# Generates resized WebP/AVIF variants of everything in static/images into
+# static/images/derived/ with content-hashed names, plus the manifest.json that
+# the responsive_img() template helper reads. Run it on deploy after the images
+# change (needs Pillow; AVIF needs Pillow >= 11.2 or the pillow-avif-plugin).
+#
+#   pip install Pillow
+#   python build_images.py                   # only re-encodes changed sources
+#   python build_images.py --force --clean   # re-encode everything, drop stale files
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from io import BytesIO
+
+try:
+    from PIL import Image, ImageOps, features
+except ImportError:
+    sys.exit("build_images.py needs Pillow: pip install Pillow")
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+STATIC = os.path.join(HERE, 'static')
+SOURCE_DIR = os.path.join(STATIC, 'images')
+OUT_DIR = os.path.join(SOURCE_DIR, 'derived')
+MANIFEST = os.path.join(OUT_DIR, 'manifest.json')
+SOURCE_EXTS = ('.jpg', '.jpeg', '.png', '.webp')
+# 96 covers the 48px logo at 2x; the rest cover cards (~370px) up to full-screen lightboxes
+WIDTHS = (96, 320, 640, 960, 1280, 1920)
+FORMATS = {
+    # format -> (Pillow format name, save options)
+    'avif': ('AVIF', {'quality': 55, 'speed': 6}),
+    'webp': ('WEBP', {'quality': 78, 'method': 6}),
+}
+
+parser = argparse.ArgumentParser(description='Build responsive image variants')
+parser.add_argument('--force', action='store_true', help='re-encode even if the source is unchanged')
+parser.add_argument('--clean', action='store_true', help='delete derived files the manifest no longer uses')
+parser.add_argument('--no-avif', action='store_true', help='skip AVIF (slow to encode, or unsupported)')
+args = parser.parse_args()
+
+
+def slugify(name):
+    return re.sub(r'[^a-z0-9]+', '-', name.lower()).strip('-') or 'image'
+
+
+def file_hash(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def encode(image, fmt, options):
+    buf = BytesIO()
+    image.save(buf, format=fmt, **options)
+    return buf.getvalue()
+
+
+def build_entry(path, rel, source_hash, formats):
+    with Image.open(path) as im:
+        im = ImageOps.exif_transpose(im)
+        if im.mode not in ('RGB', 'RGBA'):
+            im = im.convert('RGBA' if 'transparency' in im.info or im.mode in ('LA', 'P') else 'RGB')
+        width, height = im.size
+        # never upscale; a source narrower than every width still gets one variant at its own size
+        widths = [w for w in WIDTHS if w < width] + [min(width, WIDTHS[-1])]
+        entry = {'source_hash': source_hash, 'width': width, 'height': height}
+        stem = slugify(os.path.splitext(os.path.basename(rel))[0])
+        for ext in formats:
+            fmt, options = FORMATS[ext]
+            variants = []
+            for w in sorted(set(widths)):
+                resized = im if w == width else im.resize((w, round(height * w / width)), Image.LANCZOS)
+                data = encode(resized, fmt, options)
+                name = f"{stem}-{w}.{hashlib.sha1(data).hexdigest()[:10]}.{ext}"
+                out = os.path.join(OUT_DIR, name)
+                if not os.path.exists(out):
+                    with open(out, 'wb') as fh:
+                        fh.write(data)
+                variants.append([w, f"images/derived/{name}"])
+            entry[ext] = variants
+    return entry
+
+
+def main():
+    formats = [ext for ext in FORMATS if not (ext == 'avif' and (args.no_avif or not features.check('avif')))]
+    if 'avif' not in formats and not args.no_avif:
+        print("AVIF encoder not available in this Pillow build; writing WebP only")
+    os.makedirs(OUT_DIR, exist_ok=True)
+    try:
+        with open(MANIFEST) as fh:
+            manifest = json.load(fh)
+    except (OSError, ValueError):
+        manifest = {}
+
+    sources = sorted(f for f in os.listdir(SOURCE_DIR)
+                     if f.lower().endswith(SOURCE_EXTS) and os.path.isfile(os.path.join(SOURCE_DIR, f)))
+    started = time.perf_counter()
+    built = skipped = 0
+    before = after = 0
+    new_manifest = {}
+    for filename in sources:
+        path = os.path.join(SOURCE_DIR, filename)
+        rel = f"images/{filename}"
+        source_hash = file_hash(path)
+        old = manifest.get(rel)
+        up_to_date = (
+            old and not args.force and old.get('source_hash') == source_hash
+            and all(ext in old for ext in formats)
+            and all(os.path.exists(os.path.join(STATIC, p)) for ext in formats for _, p in old[ext])
+        )
+        if up_to_date:
+            entry = {k: v for k, v in old.items() if k in ('source_hash', 'width', 'height', *formats)}
+            skipped += 1
+        else:
+            entry = build_entry(path, rel, source_hash, formats)
+            built += 1
+            print(f"  {rel}: {entry['width']}x{entry['height']} -> {len(entry['webp'])} widths x {len(formats)} formats")
+        new_manifest[rel] = entry
+        before += os.path.getsize(path)
+        # what a ~400px card slot on a 2x phone would now download
+        card = next((p for w, p in entry['webp'] if w >= 640), entry['webp'][-1][1])
+        after += os.path.getsize(os.path.join(STATIC, card))
+
+    tmp = MANIFEST + '.tmp'
+    with open(tmp, 'w') as fh:
+        json.dump(new_manifest, fh, indent=1, sort_keys=True)
+    os.replace(tmp, MANIFEST)
+
+    if args.clean:
+        used = {os.path.basename(p) for entry in new_manifest.values() for ext in formats for _, p in entry[ext]}
+        for name in os.listdir(OUT_DIR):
+            if name != os.path.basename(MANIFEST) and name not in used:
+                os.remove(os.path.join(OUT_DIR, name))
+
+    print(f"{built} built, {skipped} unchanged in {time.perf_counter() - started:.1f}s; "
+          f"originals {before / 1e6:.1f} MB vs 640w WebP {after / 1e6:.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,18 @@
+# check_query_budgets.py
+# Query-count budgets per route, so eager-loading fixes stay fixed. The budgets are
+# pytest tests (tests/test_query_budgets.py, fixtures in tests/conftest.py) and run
+# with the rest of the suite; this runs just those.
+#
+#   python check_query_budgets.py        # exit 1 on any over-budget route
+#   python check_query_budgets.py -v     # one line per route
+#
+# Lower a budget when a change makes a route cheaper; raising one needs a reason.
+import os
+import sys
+
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([os.path.join(HERE, 'tests', 'test_query_budgets.py'), '-q', *sys.argv[1:]]))
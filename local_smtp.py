@@ -0,0 +1,93 @@
+# local_smtp.py
+# Minimal SMTP sink for local testing: accepts EHLO/AUTH/MAIL/RCPT/DATA, keeps
+# the messages in memory and counts connections. No TLS, so point the app at it
+# with MAIL_USE_TLS=False. (aiosmtpd works too: python -m aiosmtpd -n -l localhost:1025)
+#
+#   python local_smtp.py --port 1025
+import argparse
+import socketserver
+import threading
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def _reply(self, line):
+        self.wfile.write((line + '\r\n').encode())
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+        self._reply('220 localhost local SMTP sink ready')
+        mail_from, rcpts = None, []
+        while True:
+            raw = self.rfile.readline()
+            if not raw:
+                return
+            line = raw.decode(errors='replace').rstrip('\r\n')
+            verb = line.split(' ', 1)[0].upper()
+            if verb == 'EHLO':
+                self._reply('250-localhost')
+                self._reply('250-AUTH PLAIN LOGIN')
+                self._reply('250 8BITMIME')
+            elif verb == 'HELO':
+                self._reply('250 localhost')
+            elif verb == 'AUTH':
+                self._reply('235 2.7.0 Authentication successful')
+            elif verb == 'MAIL':
+                mail_from, rcpts = line[10:].strip(), []
+                self._reply('250 OK')
+            elif verb == 'RCPT':
+                rcpts.append(line[8:].strip())
+                self._reply('250 OK')
+            elif verb == 'DATA':
+                self._reply('354 End data with <CR><LF>.<CR><LF>')
+                chunks = []
+                while True:
+                    data_line = self.rfile.readline()
+                    if not data_line or data_line in (b'.\r\n', b'.\n'):
+                        break
+                    chunks.append(data_line)
+                with server.lock:
+                    server.messages.append((mail_from, rcpts, b''.join(chunks)))
+                self._reply('250 OK: queued')
+            elif verb in ('RSET', 'NOOP'):
+                self._reply('250 OK')
+            elif verb == 'QUIT':
+                self._reply('221 Bye')
+                return
+            else:
+                self._reply('502 Command not implemented')
+
+
+class LocalSMTPServer(socketserver.ThreadingTCPServer):
+    """Threaded in-memory SMTP sink. Use port 0 to pick a free port; see .port."""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host='127.0.0.1', port=0):
+        super().__init__((host, port), _SMTPHandler)
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.messages = []
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def start(self):
+        """Serve from a daemon thread and return self."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local SMTP sink')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=1025)
+    args = parser.parse_args()
+    server = LocalSMTPServer(args.host, args.port)
+    print(f"Local SMTP sink listening on {args.host}:{server.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"{server.connections} connections, {len(server.messages)} messages received")
@@ -0,0 +1,172 @@
+# measure_page.py
+# Renders the landing page and totals what a first visit downloads before it is
+# usable: the HTML, every stylesheet and script it references, and the images
+# that are not lazy-loaded. Render-blocking requests are counted separately.
+#
+#   python measure_page.py                     # current templates, in-process
+#   python measure_page.py --baseline HEAD~1   # side by side with index.html from a git revision
+#   python measure_page.py --url http://127.0.0.1:8000/
+#
+# CDN files are fetched over the network; when that fails, Bootstrap files are
+# estimated from the vendored copy of the same library (marked "~").
+import argparse
+import gzip
+import os
+import re
+import subprocess
+import urllib.parse
+import urllib.request
+from html.parser import HTMLParser
+
+parser = argparse.ArgumentParser(description='Landing page weight and request count')
+parser.add_argument('--baseline', metavar='GIT_REF', help='also measure templates/index.html from this revision')
+parser.add_argument('--url', help='measure a running server instead (no --baseline)')
+args = parser.parse_args()
+
+if not args.url:
+    os.environ['DATABASE_URL'] = 'sqlite://'
+    os.environ['MAIL_USERNAME'] = ''
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+VENDOR_MIRRORS = [
+    (re.compile(r'bootstrap@5[^/]*/dist/css/bootstrap\.min\.css'), 'static/vendor/bootstrap-5.3.8/bootstrap.min.css'),
+    (re.compile(r'bootstrap@5[^/]*/dist/js/bootstrap(\.bundle)?\.min\.js'), 'static/vendor/bootstrap-5.3.8/bootstrap.min.js'),
+    (re.compile(r'bootstrap-icons@[^/]*/font/bootstrap-icons(\.min)?\.css'),
+     'static/vendor/bootstrap-icons-1.13.1/bootstrap-icons.min.css'),
+]
+
+
+class ResourceParser(HTMLParser):
+    """Collects (kind, url, blocking) for everything a first visit fetches."""
+
+    def __init__(self):
+        super().__init__()
+        self.resources = []
+        self.in_head = False
+        self.in_noscript = False
+        self.picture_sources = []
+
+    def handle_starttag(self, tag, attrs):
+        a = dict(attrs)
+        if tag == 'head':
+            self.in_head = True
+        elif tag == 'noscript':
+            self.in_noscript = True
+        elif self.in_noscript:
+            return
+        elif tag == 'link' and a.get('href'):
+            rel = (a.get('rel') or '').lower()
+            if rel == 'stylesheet':
+                blocking = self.in_head and a.get('media', 'all') in ('all', 'screen')
+                self.resources.append(('css', a['href'], blocking))
+            elif rel == 'preload' and a.get('as') == 'style':
+                self.resources.append(('css', a['href'], False))
+        elif tag == 'script' and a.get('src'):
+            blocking = 'defer' not in a and 'async' not in a
+            self.resources.append(('js', a['src'], blocking))
+        elif tag == 'source' and a.get('srcset'):
+            self.picture_sources.append(a)
+        elif tag == 'img' and a.get('src') and a.get('loading') != 'lazy':
+            self.resources.append(('img', self._pick(a), False))
+        if tag == 'img':
+            self.picture_sources = []
+
+    def handle_endtag(self, tag):
+        if tag == 'head':
+            self.in_head = False
+        elif tag == 'noscript':
+            self.in_noscript = False
+
+    def _pick(self, img):
+        # the candidate a 2x screen picks for a fixed "NNpx" slot, first (best) format wins
+        for source in self.picture_sources + [img]:
+            if not source.get('srcset'):
+                continue
+            slot = re.fullmatch(r'\s*(\d+)px\s*', source.get('sizes', ''))
+            candidates = [(int(w), u) for u, w in re.findall(r'(\S+)\s+(\d+)w', source['srcset'])]
+            if slot and candidates:
+                wanted = 2 * int(slot.group(1))
+                return min((c for c in candidates if c[0] >= wanted), default=max(candidates))[1]
+        return img['src']
+
+
+def fetch_size(url, client):
+    """(transfer bytes, estimated?) with the encodings a browser would accept."""
+    headers = {'Accept-Encoding': 'br, gzip'}
+    if url.startswith('//'):
+        url = 'https:' + url
+    if url.startswith('http') and (args.url is None or not url.startswith(args.url)):
+        try:
+            req = urllib.request.Request(url, headers={**headers, 'User-Agent': 'Mozilla/5.0'})
+            with urllib.request.urlopen(req, timeout=5) as resp:
+                return len(resp.read()), False
+        except OSError:
+            for pattern, local in VENDOR_MIRRORS:
+                if pattern.search(url):
+                    with open(os.path.join(HERE, local), 'rb') as fh:
+                        return len(gzip.compress(fh.read())), True
+            return None, True
+    if args.url:
+        req = urllib.request.Request(urllib.parse.urljoin(args.url, url), headers=headers)
+        with urllib.request.urlopen(req, timeout=10) as resp:
+            return len(resp.read()), False
+    response = client.get(url, headers=headers)
+    return (len(response.data) if response.status_code == 200 else None), False
+
+
+def measure(html, client):
+    parser_ = ResourceParser()
+    parser_.feed(html)
+    rows = [('html', '(document)', True, len(gzip.compress(html.encode())), True)]
+    for kind, url, blocking in parser_.resources:
+        size, estimated = fetch_size(url, client)
+        rows.append((kind, url, blocking, size, estimated))
+    return rows
+
+
+def summarize(label, rows):
+    print(f"\n== {label}")
+    for kind, url, blocking, size, estimated in rows:
+        shown = 'n/a' if size is None else f"{'~' if estimated else ''}{size / 1024:.1f} KB"
+        print(f"  {kind:<4} {'BLOCKING' if blocking else '        '} {shown:>10}  {url[:90]}")
+    total = sum(r[3] or 0 for r in rows)
+    blocking = [r for r in rows if r[2]]
+    print(f"  -> {len(rows)} requests, {total / 1024:.1f} KB; render-blocking: {len(blocking)} requests, "
+          f"{sum(r[3] or 0 for r in blocking) / 1024:.1f} KB")
+    return total, len(rows), len(blocking)
+
+
+def render(template_source=None):
+    from app import app, render_index
+    import jinja2
+    loader = app.jinja_env.loader
+    if template_source is not None:
+        app.jinja_env.loader = jinja2.ChoiceLoader([jinja2.DictLoader({'index.html': template_source}), loader])
+        app.jinja_env.cache.clear()
+    try:
+        with app.test_request_context('/'):
+            return render_index()
+    finally:
+        app.jinja_env.loader = loader
+        app.jinja_env.cache.clear()
+
+
+if args.url:
+    with urllib.request.urlopen(args.url, timeout=10) as resp:
+        summarize(args.url, measure(resp.read().decode(), None))
+else:
+    from app import app, init_db, seed_db
+    with app.app_context():
+        init_db()
+        seed_db()
+    client = app.test_client()
+    results = []
+    if args.baseline:
+        old = subprocess.run(['git', 'show', f'{args.baseline}:templates/index.html'],
+                             cwd=HERE, check=True, capture_output=True, text=True).stdout
+        results.append(summarize(f'index.html @ {args.baseline}', measure(render(old), client)))
+    results.append(summarize('index.html (working tree)', measure(render(), client)))
+    if len(results) == 2:
+        (b_bytes, b_reqs, b_block), (a_bytes, a_reqs, a_block) = results
+        print(f"\nbefore -> after: {b_reqs} -> {a_reqs} requests, {b_bytes / 1024:.0f} -> {a_bytes / 1024:.0f} KB, "
+              f"{b_block} -> {a_block} render-blocking")
@@ -0,0 +1,44 @@
+# outbox_worker.py
+# Drains the email_outbox table in its own process so /book and the admin
+# status changes never wait on SMTP.
+#
+#   python outbox_worker.py            # run forever, polling every OUTBOX_POLL_SECONDS
+#   python outbox_worker.py --once     # send whatever is due and exit (cron-friendly)
+import argparse
+import os
+import time
+
+from app import app, db, drain_outbox, mail_pool
+
+parser = argparse.ArgumentParser(description='Send queued booking emails')
+parser.add_argument('--once', action='store_true', help='drain what is due, then exit')
+parser.add_argument('--batch-size', type=int, default=int(os.getenv('OUTBOX_BATCH_SIZE', 50)))
+parser.add_argument('--poll', type=float, default=float(os.getenv('OUTBOX_POLL_SECONDS', 2)))
+args = parser.parse_args()
+
+# staff emails link back to the admin panel; there is no request here to take the host from
+if not app.config['PUBLIC_BASE_URL'] and not app.config.get('SERVER_NAME'):
+    parser.error("set PUBLIC_BASE_URL (e.g. https://hotel.example.com) so emailed admin links are absolute")
+
+with app.app_context():
+    app.logger.info("outbox worker started (batch size %d)", args.batch_size)
+    try:
+        while True:
+            try:
+                processed = drain_outbox(args.batch_size)
+            except Exception:
+                app.logger.exception("outbox worker: batch failed; retrying after poll interval")
+                db.session.rollback()
+                processed = 0
+            finally:
+                db.session.remove()
+
+            if processed:
+                app.logger.info("outbox worker: processed %d emails; smtp pool %s", processed, mail_pool.metrics())
+            if args.once and processed < args.batch_size:
+                break
+            # a full batch means more is probably due; go straight back for it
+            if processed < args.batch_size:
+                time.sleep(args.poll)
+    finally:
+        mail_pool.close()
@@ -0,0 +1,54 @@
+# smtp_pool_test.py
+# Sends a burst of messages through the app's pooled SMTP connection and prints
+# the pool metrics (handshakes, handshakes saved, send latency).
+#
+#   python smtp_pool_test.py --local        # against an in-process local_smtp.py sink
+#   python smtp_pool_test.py --count 5      # against MAIL_SERVER from .env (real sends!)
+import argparse
+import os
+
+parser = argparse.ArgumentParser(description='SMTP connection pool probe')
+parser.add_argument('--count', type=int, default=20)
+parser.add_argument('--local', action='store_true', help='start a local SMTP sink and send to it')
+args = parser.parse_args()
+
+sink = None
+if args.local:
+    from local_smtp import LocalSMTPServer
+    sink = LocalSMTPServer().start()
+    os.environ.update({
+        'MAIL_SERVER': '127.0.0.1',
+        'MAIL_PORT': str(sink.port),
+        'MAIL_USE_TLS': 'False',
+        'MAIL_USE_SSL': 'False',
+        'MAIL_USERNAME': 'pool-test@example.com',
+        'MAIL_PASSWORD': 'unused',
+        'DATABASE_URL': 'sqlite://',
+    })
+
+from flask_mail import Message  # noqa: E402
+from app import app, mail_pool  # noqa: E402
+
+recipient = os.getenv('TEST_RECIPIENT') or app.config['MAIL_USERNAME']
+with app.app_context():
+    messages = []
+    for i in range(args.count):
+        msg = Message(subject=f'SMTP pool test {i + 1}/{args.count}', recipients=[recipient])
+        msg.body = 'This is a test email from smtp_pool_test.py'
+        messages.append(msg)
+    try:
+        # half one-by-one (reuses the pooled session), half as a single batch
+        half = args.count // 2
+        for msg in messages[:half]:
+            mail_pool.send(msg)
+        mail_pool.send_many(messages[half:])
+        print("SMTP pool test succeeded")
+    except Exception as e:
+        print("SMTP pool test failed:", repr(e))
+    finally:
+        mail_pool.close()
+
+for key, value in sorted(mail_pool.metrics().items()):
+    print(f"  {key}: {value}")
+if sink:
+    print(f"local sink: {sink.connections} connections, {len(sink.messages)} messages")
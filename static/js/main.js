@@ -71,12 +71,50 @@ document.addEventListener('DOMContentLoaded', function () {
     if (checkoutInput) checkoutInput.addEventListener('change', calculatePrice);
     if (roomSelect) roomSelect.addEventListener('change', calculatePrice);
 
-    // Update room availability in real-time
+    // Update room availability in real-time from /api/availability for the chosen dates.
+    // The endpoint answers 304 while nothing changed, so re-checking on every change is cheap.
+    const guestsInput = document.querySelector('input[name="guests"]');
+    let availabilityRequest = null;
+
     function updateRoomOptions() {
-        // This would typically make an AJAX call to get latest availability
-        console.log('Room availability should be refreshed');
+        if (!roomSelect || !checkinInput.value || !checkoutInput.value || checkinInput.value >= checkoutInput.value) {
+            return;
+        }
+        const params = new URLSearchParams({
+            checkin: checkinInput.value,
+            checkout: checkoutInput.value,
+            guests: (guestsInput && guestsInput.value) || 1
+        });
+        if (availabilityRequest) availabilityRequest.abort();
+        availabilityRequest = new AbortController();
+
+        fetch(`/api/availability?${params}`, { signal: availabilityRequest.signal, headers: { 'Accept': 'application/json' } })
+            .then(function (response) { return response.ok ? response.json() : null; })
+            .then(function (data) {
+                if (!data) return;
+                data.rooms.forEach(function (room) {
+                    const option = roomSelect.querySelector(`option[value="${room.id}"]`);
+                    if (!option) return;
+                    option.dataset.price = room.nightly_price;
+                    option.dataset.available = room.available;
+                    option.disabled = !room.bookable;
+                    option.textContent = `${room.name} - ₦${room.nightly_price.toLocaleString()}/night ` +
+                        `(${room.available} available) - ₦${room.total_price.toLocaleString()} total`;
+                });
+                if (roomSelect.selectedOptions[0] && roomSelect.selectedOptions[0].disabled) {
+                    roomSelect.value = '';
+                }
+                calculatePrice();
+            })
+            .catch(function (err) {
+                if (err.name !== 'AbortError') console.warn('Could not refresh room availability', err);
+            });
     }
 
+    if (checkinInput) checkinInput.addEventListener('change', updateRoomOptions);
+    if (checkoutInput) checkoutInput.addEventListener('change', updateRoomOptions);
+    if (guestsInput) guestsInput.addEventListener('change', updateRoomOptions);
+
     // Refresh availability when modal opens
     const bookingModal = document.getElementById('bookingModal');
     if (bookingModal) {
@@ -0,0 +1,96 @@
+# stress_booking.py
+# Fires hundreds of parallel POSTs at /book for the same suite and dates, then
+# checks the room_inventory ledger never went past capacity or below zero.
+#
+#   python stress_booking.py                      # in-process, throwaway SQLite db
+#   python stress_booking.py --url http://127.0.0.1:8000 --database-url mysql+pymysql://...
+#
+# Exits non-zero if the hotel got overbooked.
+import argparse
+import os
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+parser = argparse.ArgumentParser(description='Concurrent /book stress test')
+parser.add_argument('--requests', type=int, default=300, help='total POSTs to fire')
+parser.add_argument('--threads', type=int, default=64, help='parallel workers')
+parser.add_argument('--suite', default='Celestial Presidential')
+parser.add_argument('--url', help='hit a running server instead of the in-process test client')
+parser.add_argument('--database-url', help='database the server under --url uses (for the final check)')
+args = parser.parse_args()
+
+# Configure the app before importing it: never touch the real DB or send real mail.
+if args.database_url:
+    os.environ['DATABASE_URL'] = args.database_url
+else:
+    db_file = os.path.join(tempfile.mkdtemp(), 'stress.db')
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_file}'
+os.environ['MAIL_USERNAME'] = ''
+os.environ['MAIL_PASSWORD'] = ''
+
+from app import app, db, RoomType, RoomInventory, Booking, init_db, seed_db  # noqa: E402
+
+with app.app_context():
+    init_db()
+    seed_db()
+    room_type = RoomType.query.filter_by(name=args.suite).first()
+    if not room_type:
+        sys.exit(f'RoomType not found: {args.suite}')
+    room_type_id, capacity = room_type.id, room_type.total_rooms
+
+checkin = date.today() + timedelta(days=30)
+checkout = checkin + timedelta(days=3)
+form = {
+    'full_name': 'Stress Tester',
+    'email': 'stress@example.com',
+    'checkin': checkin.isoformat(),
+    'checkout': checkout.isoformat(),
+    'room_type_id': room_type_id,
+    'guests': 1,
+}
+
+local = threading.local()
+
+
+def post_booking(_):
+    if args.url:
+        import requests
+        session = getattr(local, 'session', None) or requests.Session()
+        local.session = session
+        return session.post(args.url.rstrip('/') + '/book', data=form, allow_redirects=False).status_code
+    client = getattr(local, 'client', None) or app.test_client()
+    local.client = client
+    return client.post('/book', data=form).status_code
+
+
+with ThreadPoolExecutor(max_workers=args.threads) as pool:
+    statuses = list(pool.map(post_booking, range(args.requests)))
+
+with app.app_context():
+    booked = [
+        n for (n,) in db.session.query(RoomInventory.booked).filter(
+            RoomInventory.room_type_id == room_type_id,
+            RoomInventory.night >= checkin,
+            RoomInventory.night < checkout,
+        )
+    ]
+    active = Booking.query.filter(
+        Booking.room_type_id == room_type_id,
+        Booking.checkin == checkin,
+        Booking.status.in_(('pending', 'confirmed')),
+    ).count()
+
+print(f"{args.requests} POSTs, {args.threads} threads, status codes: {sorted(set(statuses))}")
+print(f"{args.suite}: capacity {capacity}, active bookings {active}, ledger {booked}")
+
+ok = all(0 <= n <= capacity for n in booked) and active <= capacity
+if not args.database_url:
+    # fresh database: every booked room-night must belong to a saved booking
+    ok = ok and all(n == active for n in booked)
+if not ok:
+    print("FAILED: inventory overbooked or out of sync")
+    sys.exit(1)
+print("OK: inventory never went negative or past capacity")
@@ -0,0 +1,85 @@
+# conftest.py
+# A scratch in-memory database, seeded once per run, with the N+1 guard in raise
+# mode, plus an `assert_max_queries` fixture for per-route query budgets:
+#
+#   def test_admin_list(admin_client, assert_max_queries):
+#       with assert_max_queries(2):
+#           assert admin_client.get('/admin').status_code == 200
+import os
+from datetime import date, timedelta
+
+import pytest
+
+os.environ.update({
+    'DATABASE_URL': 'sqlite://',
+    'MAIL_USERNAME': '',
+    'MAIL_PASSWORD': '',
+    'ADMIN_USER': 'budget-admin',
+    'ADMIN_PASSWORD': 'budget-password',
+    'QUERY_GUARD': 'raise',
+    'QUERY_GUARD_REPEATS': '2',
+    'PUBLIC_BASE_URL': 'https://hotel.example.com',
+})
+
+import app as hotel  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def app():
+    hotel.app.logger.setLevel('ERROR')
+    with hotel.app.app_context():
+        hotel.init_db()
+        hotel.seed_db()
+        hotel.room_catalog.all()
+    return hotel.app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture(scope='session')
+def admin_client(app, bookings):
+    client = app.test_client()
+    response = client.post('/admin/login', data={
+        'username': os.environ['ADMIN_USER'], 'password': os.environ['ADMIN_PASSWORD']})
+    assert response.status_code == 302
+    with app.app_context():
+        hotel.admin_directory.get(0)  # identities are cached per process, like the room catalog
+    return client
+
+
+def post_booking(client, n):
+    rooms = hotel.room_catalog.all()
+    room = rooms[n % len(rooms)]
+    checkin = date.today() + timedelta(days=10 + n)
+    return client.post('/book', data={
+        'full_name': f'Budget Guest {n}', 'email': f'budget{n}@example.com', 'phone': '+2348000000000',
+        'checkin': checkin.isoformat(), 'checkout': (checkin + timedelta(days=2)).isoformat(),
+        'room_type_id': room.id, 'guests': 1,
+    })
+
+
+@pytest.fixture
+def book(app):
+    """book(n): POST /book for guest n, a fresh two-night stay from a fresh visitor."""
+    return lambda n: post_booking(app.test_client(), n)
+
+
+@pytest.fixture(scope='session')
+def bookings(app):
+    """Enough bookings to fill an admin page (and queue 50 emails), so a per-row lazy load would repeat."""
+    client = app.test_client()
+    for n in range(25):
+        assert post_booking(client, n).status_code == 302
+    with app.app_context():
+        return [b_id for (b_id,) in hotel.Booking.query.with_entities(hotel.Booking.id).order_by(hotel.Booking.id)]
+
+
+@pytest.fixture
+def assert_max_queries(app):
+    """assert_max_queries(n): fail if the block runs more than n statements, or repeats one (N+1)."""
+    def budget(limit):
+        return hotel.assert_max_queries(limit, max_repeats=app.config['QUERY_GUARD_REPEATS'])
+    return budget
@@ -0,0 +1,91 @@
+# Query-count budgets per route, so eager-loading fixes stay fixed. Lower a budget
+# when a change makes a route cheaper; raising one needs a reason.
+from datetime import date, timedelta
+
+import pytest
+
+import app as hotel
+
+
+def test_book(book, bookings, assert_max_queries):
+    with assert_max_queries(8):
+        response = book(len(bookings))
+    assert response.status_code == 302
+
+
+def test_index(client, bookings, assert_max_queries):
+    # a fresh visitor: /book leaves flash messages in the booker's session
+    with assert_max_queries(2):
+        assert client.get('/').status_code == 200
+    with assert_max_queries(1):  # page cache hit
+        assert client.get('/').status_code == 200
+
+
+def test_api_availability(client, assert_max_queries):
+    checkin = date.today() + timedelta(days=60)
+    with assert_max_queries(2):
+        response = client.get(f'/api/availability?checkin={checkin}&checkout={checkin + timedelta(days=3)}&guests=2')
+    assert response.status_code == 200
+
+
+def test_admin_login(client, assert_max_queries):
+    with assert_max_queries(1):
+        response = client.post('/admin/login', data={'username': 'budget-admin', 'password': 'budget-password'})
+    assert response.status_code == 302
+
+
+# authenticated requests load the admin from the directory, not the database
+@pytest.mark.parametrize('query', ['', '?status=pending', '?q=budget1', '?email=budget1'])
+def test_admin_list(admin_client, query, assert_max_queries):
+    with assert_max_queries(2):
+        assert admin_client.get(f'/admin{query}').status_code == 200
+
+
+def test_admin_reports(admin_client, assert_max_queries):
+    with assert_max_queries(2):
+        assert admin_client.get('/admin/reports').status_code == 200
+
+
+def test_admin_export(admin_client, assert_max_queries):
+    with assert_max_queries(1):
+        response = admin_client.get('/admin/bookings/export?status=pending')
+        response.get_data()  # a streamed response's queries count too
+    assert response.status_code == 200
+
+
+def test_admin_booking_detail(admin_client, bookings, assert_max_queries):
+    with assert_max_queries(1):
+        assert admin_client.get(f'/admin/booking/{bookings[0]}').status_code == 200
+
+
+def test_admin_booking_status(admin_client, bookings, assert_max_queries):
+    with assert_max_queries(4):
+        response = admin_client.post(f'/admin/booking/{bookings[1]}/status', data={'status': 'confirmed'})
+    assert response.status_code == 302
+
+
+def _bulk_status(client, booking_ids, status):
+    # JSON, so a guard error inside the transaction shows up as a 500 rather than a flash
+    return client.post('/admin/bookings/status', data={'status': status, 'booking_ids': booking_ids},
+                       headers={'Accept': 'application/json'})
+
+
+# set-based: the same handful of statements whether 2 or 200 bookings are ticked
+def test_admin_bulk_cancel(admin_client, bookings, assert_max_queries):
+    _bulk_status(admin_client, bookings[:20], 'confirmed')
+    with assert_max_queries(7):
+        assert _bulk_status(admin_client, bookings[:20], 'cancelled').status_code == 200
+
+
+def test_admin_bulk_reactivate(admin_client, bookings, assert_max_queries):
+    _bulk_status(admin_client, bookings[:20], 'cancelled')
+    with assert_max_queries(9):
+        assert _bulk_status(admin_client, bookings[:20], 'confirmed').status_code == 200
+
+
+def test_drain_outbox(app, bookings, assert_max_queries):
+    # 50+ queued emails: the batch's bookings must load in one query, not one per email
+    with app.app_context():
+        with assert_max_queries(3):
+            processed = hotel.drain_outbox(100)
+    assert processed >= 50